@@ -4,8 +4,9 @@
 Учебный парсер Books to Scrape.
 
 Функции:
-- get_book_data(book_url) -> dict
-- scrape_books(catalog_page1_url, is_save=False, return_json=False, page_count=0, verbose=True)
+- get_book_data(book_url, session=None) -> dict
+- scrape_books(catalog_page1_url, is_save=False, return_json=False, page_count=0, verbose=True,
+               pretty_json=False)
 
 Совместимо с автотестами:
 - ключи в get_book_data в lower-case;
@@ -16,15 +17,33 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import math
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree, html as lxml_html
+from urllib3.util.retry import Retry
+
+# orjson — необязательная зависимость: сериализует в разы быстрее стандартного json
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# aiohttp — необязательная зависимость: без него книги качаются пулом потоков
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
 
 
 # ==========================
@@ -32,6 +51,62 @@ from bs4 import BeautifulSoup
 # ==========================
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 TIMEOUT = 15
+# повтор запроса на 502/503/504 и сетевых ошибках (одинаково для requests и aiohttp)
+RETRIES = 3
+RETRY_BACKOFF = 0.3
+_RETRY_STATUSES = (502, 503, 504)
+# сколько страниц книг качаем одновременно: aiohttp (= размер пула соединений) / потоки
+CONCURRENCY = 32
+THREAD_WORKERS = 16
+# сколько страниц каталога качаем одновременно
+CATALOG_WORKERS = 8
+# верхняя граница обхода каталога, если page_count не задан
+MAX_CATALOG_PAGES = 50
+
+
+def _build_session() -> requests.Session:
+    """Сессия с пулом keep-alive соединений и повтором на 502/503/504."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(
+        total=RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=_RETRY_STATUSES
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# одна сессия на модуль: TCP/TLS-рукопожатие не повторяется на каждой странице
+_SESSION = _build_session()
+
+
+# ==========================
+# Настройки парсинга
+# ==========================
+# для страниц каталога: lxml (C-парсер) в разы быстрее встроенного html.parser
+_BS_PARSER = "lxml"
+
+# из страницы каталога строим дерево только для карточек книг (без меню, футера и т.п.)
+_ARTICLE_STRAINER = SoupStrainer("article", class_="product_pod")
+
+# рейтинг на сайте кодируется классом: "star-rating Three"
+_RATING_CLASSES = {"One": "1", "Two": "2", "Three": "3", "Four": "4", "Five": "5"}
+_RATING_KEYS = frozenset(_RATING_CLASSES)
+
+# регулярки компилируем один раз на модуль
+_MONEY_RE = re.compile(r"[^\d.\-]")
+_PAGE_RE = re.compile(r"page-\d+\.html")
+
+# XPath для страницы книги компилируем один раз, а не на каждом вызове
+_XP_TITLE = etree.XPath("string(//div[contains(@class,'product_main')]/h1)")
+_XP_RATING = etree.XPath(
+    "//div[contains(@class,'product_main')]/p[contains(@class,'star-rating')]/@class"
+)
+_XP_DESC = etree.XPath(
+    "string(//div[@id='product_description']/following-sibling::p[1])"
+)
+_XP_TABLE = etree.XPath("//table[contains(@class,'table-striped')]//tr")
 
 
 # ==========================
@@ -41,23 +116,39 @@ def _to_float_money(s: Optional[str]) -> Optional[float]:
     """Извлечь число из денежной строки (убираем валюту, пробелы и запятые)."""
     if not s:
         return None
-    s = re.sub(r"[^\d.\-]", "", s)  # оставим только цифры/точки/минус
+    # быстрый путь: на сайте цена всегда вида '£51.77' ('Â£51.77' — UTF-8, прочитанный как latin-1)
+    try:
+        value = float(s.lstrip("£Â \t").rstrip())
+    except ValueError:
+        value = None
+    # float() понимает и 'nan'/'inf' — это не цена (и невалидный JSON)
+    if value is not None and math.isfinite(value):
+        return value
     try:
-        return float(s)
+        return float(_MONEY_RE.sub("", s))  # оставим только цифры/точки/минус
     except ValueError:
         return None
 
 
-def _rating_from_class(tag) -> Optional[str]:
-    """Преобразуем CSS-класс star-rating (One..Five) в строку '1'..'5'."""
-    if not tag or not tag.get("class"):
+def _rating_from_class(classes: Optional[str]) -> Optional[str]:
+    """Преобразуем CSS-класс star-rating (One..Five) в строку '1'..'5'.
+
+    На вход — значение атрибута class целиком, например 'star-rating Three'.
+    """
+    if not classes:
         return None
-    classes = tag["class"]
-    scale = {"One": "1", "Two": "2", "Three": "3", "Four": "4", "Five": "5"}
-    for cls in classes:
-        if cls in scale:
-            return scale[cls]
-    return None
+    hit = _RATING_KEYS.intersection(classes.split())
+    return _RATING_CLASSES[next(iter(hit))] if hit else None
+
+
+def _json_bytes(obj, indent: bool = False) -> bytes:
+    """JSON в UTF-8 (не-ASCII без экранирования): через orjson, если он установлен."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    # компактно, как orjson: строка не должна зависеть от установленных пакетов
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 
 def _ensure_artifacts_file() -> Path:
@@ -70,47 +161,94 @@ def _ensure_artifacts_file() -> Path:
 
 def _mk_page_url(catalog_page1_url: str, n: int) -> str:
     """catalogue/page-1.html -> catalogue/page-{n}.html"""
-    return re.sub(r"page-\d+\.html", f"page-{n}.html", catalog_page1_url)
+    return _PAGE_RE.sub(f"page-{n}.html", catalog_page1_url)
 
 
-# ==========================
-# Основные функции
-# ==========================
-def get_book_data(book_url: str) -> dict:
+def _fetch_catalog_page(page_url: str) -> requests.Response:
+    """GET страницы каталога через общую сессию (статус проверяет вызывающий)."""
+    return _SESSION.get(page_url, timeout=TIMEOUT)
+
+
+def _iter_catalog_pages(page_urls: List[str]) -> Iterator[Tuple[int, str, requests.Response]]:
     """
-    Забрать данные со страницы книги (Books to Scrape).
+    Отдаёт (номер, URL, ответ) страниц каталога по порядку.
 
-    Формат возвращаемого словаря (как ожидают тесты):
-    {
-      'title': str,
-      'price': float | None,          # из price_text
-      'price_text': str,              # исходная строка с валютой
-      'rating': '1'..'5' | '',
-      'availability': str,
-      'description': str,
-      'product_info': dict[str, str], # таблица Product Information
-      '_source_url': str              # абсолютный URL страницы
-    }
+    Качаем окнами по CATALOG_WORKERS страниц параллельно; следующее окно запрашивается,
+    только когда вызывающий дочитал текущее — после break запросов больше нет.
+    """
+    with ThreadPoolExecutor(max_workers=CATALOG_WORKERS) as pool:
+        for start in range(0, len(page_urls), CATALOG_WORKERS):
+            window = page_urls[start : start + CATALOG_WORKERS]
+            responses = pool.map(_fetch_catalog_page, window)
+            yield from zip(range(start + 1, start + len(window) + 1), window, responses)
+
+
+def _collect_book_urls(catalog_page1_url: str, page_count: int, verbose: bool) -> List[str]:
     """
-    # нормализуем URL
+    Собрать абсолютные URL книг со страниц каталога (в порядке каталога).
+
+    page_count <= 0 — обходим до первой 404, но не дальше MAX_CATALOG_PAGES.
+    """
+    urls: List[str] = []
+    max_pages = page_count if page_count and page_count > 0 else MAX_CATALOG_PAGES
+    # ссылки на книги в каталоге относительные ('the-book_123/index.html'):
+    # склеиваем строкой с базой каталога вместо urljoin на каждую ссылку
+    cat_base = catalog_page1_url.rsplit("/", 1)[0] + "/"
+
+    # страницы каталога независимы: качаем их окнами параллельно, разбираем по порядку
+    # до первой 404; за концом каталога запрашивается не больше одного окна
+    page_urls = [_mk_page_url(catalog_page1_url, n) for n in range(1, max_pages + 1)]
+    pages = _iter_catalog_pages(page_urls)
+    try:
+        for page, page_url, r in pages:
+            if r.status_code == 404:
+                if verbose:
+                    print(f"Страница {page} вернула 404 — остановка.")
+                break
+            r.raise_for_status()
+            if verbose:
+                print(f"Обработаны ссылки со страницы №{page}")
+
+            soup = BeautifulSoup(r.text, _BS_PARSER, parse_only=_ARTICLE_STRAINER)
+            for h3 in soup.find_all("h3"):
+                a = h3.find("a")
+                if a is None:
+                    continue
+                href = a.get("href", "")
+                if href.startswith(("http://", "https://", "/", ".")):
+                    urls.append(urljoin(page_url, href))
+                else:
+                    urls.append(cat_base + href)
+    finally:
+        pages.close()  # дождаться текущего окна и не начинать следующее
+    return urls
+
+
+def _normalize_book_url(book_url: str) -> str:
+    """Относительный URL книги -> абсолютный."""
+    if book_url.startswith(("http://", "https://")):
+        return book_url  # частый случай: без разбора через urlparse
     if not urlparse(book_url).scheme:
         book_url = urljoin("http://books.toscrape.com/", book_url)
+    return book_url
 
-    resp = requests.get(book_url, headers=HEADERS, timeout=TIMEOUT)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
 
-    title_tag = soup.select_one(".product_main h1")
-    rating_tag = soup.select_one(".product_main p.star-rating")
-    desc_tag = soup.select_one("#product_description ~ p")
+def _parse_book_page(html: bytes, book_url: str) -> dict:
+    """Разобрать HTML страницы книги в словарь (формат — см. get_book_data).
 
-    # таблица характеристик в dict
-    product_info: Dict[str, str] = {}
-    for row in soup.select("table.table.table-striped tr"):
-        th = row.find("th")
-        td = row.find("td")
-        if th and td:
-            product_info[th.get_text(strip=True)] = td.get_text(strip=True)
+    html — сырые байты ответа: кодировку lxml берёт из <meta charset> страницы,
+    поэтому результат не зависит от HTTP-клиента (сайт не шлёт charset в заголовке).
+    """
+    tree = lxml_html.fromstring(html)
+    rating_cls = _XP_RATING(tree)
+
+    # таблица характеристик в dict: строки <tr><th>ключ</th><td>значение</td></tr>;
+    # ячейки — листья с простым текстом, поэтому .text без обхода поддерева
+    product_info: Dict[str, str] = {
+        (row[0].text or "").strip(): (row[1].text or "").strip()
+        for row in _XP_TABLE(tree)
+        if len(row) >= 2
+    }
 
     # берём price_text из "Price (incl. tax)" (если нет — из "Price (excl. tax)")
     price_text = (
@@ -121,28 +259,139 @@ def get_book_data(book_url: str) -> dict:
     price_num = _to_float_money(price_text)
 
     data = {
-        "title": title_tag.get_text(strip=True) if title_tag else "",
+        "title": _XP_TITLE(tree).strip(),
         "price": price_num,
         "price_text": price_text,
-        "rating": _rating_from_class(rating_tag) or "",
+        "rating": _rating_from_class(rating_cls[0] if rating_cls else None) or "",
         "availability": product_info.get("Availability", ""),
-        "description": desc_tag.get_text(strip=True) if desc_tag else "",
+        "description": _XP_DESC(tree).strip(),
         "product_info": product_info,
         "_source_url": book_url,
     }
     return data
 
 
+# ==========================
+# Параллельная загрузка книг
+# ==========================
+async def _fetch(session: aiohttp.ClientSession, url: str) -> bytes:
+    """Скачать страницу и вернуть её сырые байты (с повторами, как у _SESSION)."""
+    for attempt in range(RETRIES + 1):
+        last = attempt == RETRIES
+        try:
+            async with session.get(url) as resp:
+                if last or resp.status not in _RETRY_STATUSES:
+                    resp.raise_for_status()
+                    return await resp.read()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last:
+                raise
+        await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+
+
+async def _get_book_data_async(session: aiohttp.ClientSession, book_url: str) -> dict:
+    """Асинхронный аналог get_book_data (book_url — уже абсолютный, из каталога)."""
+    return _parse_book_page(await _fetch(session, book_url), book_url)
+
+
+async def _sem_get(
+    sem: asyncio.Semaphore, session: aiohttp.ClientSession, book_url: str
+) -> Optional[dict]:
+    """get_book_data под семафором; неудачная книга -> None."""
+    async with sem:
+        try:
+            return await _get_book_data_async(session, book_url)
+        except Exception:
+            # не валимся на одной неудачной книге
+            return None
+
+
+async def _scrape_async(urls: List[str], on_book: Callable[[dict], None]) -> None:
+    """Параллельно скачать и разобрать книги, отдавая их в on_book в порядке urls."""
+    # семафор не шире пула соединений: иначе лишние запросы ждут соединение,
+    # а ожидание съедает таймаут; таймауты — на соединение и чтение, не на весь запрос
+    sem = asyncio.Semaphore(CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit_per_host=CONCURRENCY, keepalive_timeout=30)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=TIMEOUT, sock_read=TIMEOUT),
+    ) as session:
+        tasks = [asyncio.ensure_future(_sem_get(sem, session, u)) for u in urls]
+        # ждём задачи по порядку: готовый префикс уходит в on_book, пока остальные качаются
+        for task in tasks:
+            book = await task
+            if book is not None:
+                on_book(book)
+
+
+def _scrape_threaded(urls: List[str], on_book: Callable[[dict], None]) -> None:
+    """Запасной вариант без aiohttp: пул потоков поверх общей requests-сессии."""
+    with ThreadPoolExecutor(max_workers=THREAD_WORKERS) as pool:
+        futures = [pool.submit(get_book_data, u) for u in urls]
+        for fut in futures:
+            try:
+                book = fut.result()
+            except Exception:
+                # не валимся на одной неудачной книге
+                continue
+            on_book(book)
+
+
+def _scrape_book_pages(urls: List[str], on_book: Callable[[dict], None]) -> None:
+    """Скачать и разобрать книги (aiohttp, если можно, иначе пул потоков).
+
+    Каждая успешно разобранная книга сразу передаётся в on_book, в порядке urls.
+    """
+    try:
+        asyncio.get_running_loop()
+        loop_running = True  # например, ячейка Jupyter: asyncio.run здесь нельзя
+    except RuntimeError:
+        loop_running = False
+    if aiohttp is not None and not loop_running:
+        asyncio.run(_scrape_async(urls, on_book))
+    else:
+        _scrape_threaded(urls, on_book)
+
+
+# ==========================
+# Основные функции
+# ==========================
+def get_book_data(book_url: str, session: Optional[requests.Session] = None) -> dict:
+    """
+    Забрать данные со страницы книги (Books to Scrape).
+
+    session — HTTP-сессия для запроса (по умолчанию общая сессия модуля).
+
+    Формат возвращаемого словаря (как ожидают тесты):
+    {
+      'title': str,
+      'price': float | None,          # из price_text
+      'price_text': str,              # исходная строка с валютой
+      'rating': '1'..'5' | '',
+      'availability': str,
+      'description': str,
+      'product_info': dict[str, str], # таблица Product Information
+      '_source_url': str              # абсолютный URL страницы
+    }
+    """
+    book_url = _normalize_book_url(book_url)
+    resp = (session or _SESSION).get(book_url, timeout=TIMEOUT)
+    resp.raise_for_status()
+    return _parse_book_page(resp.content, book_url)
+
+
 def scrape_books(
     catalog_page1_url: str,
     is_save: bool = False,
     return_json: bool = False,
     page_count: int = 0,
     verbose: bool = True,
+    pretty_json: bool = False,
 ) -> List[dict] | str:
     """
     Обходит страницы каталога Books to Scrape, собирает ссылки на книги,
-    парсит каждую книгу через get_book_data и возвращает:
+    параллельно (aiohttp или пул потоков) парсит каждую книгу и возвращает:
       - list[dict], если return_json=False;
       - JSON-строку, если return_json=True.
 
@@ -152,27 +401,12 @@ def scrape_books(
       return_json       : bool  вернуть JSON-строку вместо списка словарей
       page_count        : int   сколько страниц обойти (<=0 — обойти до 404/конца каталога)
       verbose           : bool  печатать прогресс
+      pretty_json       : bool  при is_save+return_json писать в файл JSON с отступами
+                                (отдельная сериализация; по умолчанию файл = возвращаемая строка)
     """
     # --- Сбор ссылок на книги ---
-    urls: List[str] = []
-    max_pages = page_count if page_count and page_count > 0 else 50
-
     t0 = time.time()
-    for page in range(1, max_pages + 1):
-        page_url = _mk_page_url(catalog_page1_url, page)
-        r = requests.get(page_url, headers=HEADERS, timeout=TIMEOUT)
-        if r.status_code == 404:
-            if verbose:
-                print(f"Страница {page} вернула 404 — остановка.")
-            break
-        r.raise_for_status()
-        if verbose:
-            print(f"Обработаны ссылки со страницы №{page}")
-
-        soup = BeautifulSoup(r.text, "html.parser")
-        for a in soup.select("article.product_pod h3 a"):
-            href = a.get("href", "")
-            urls.append(urljoin(page_url, href))
+    urls = _collect_book_urls(catalog_page1_url, page_count, verbose)
 
     if verbose:
         print(f"Время обработки ссылок: {time.time() - t0:.2f} сек.")
@@ -182,35 +416,36 @@ def scrape_books(
     # --- Парсинг книг ---
     books: List[dict] = []
     t1 = time.time()
-    for u in urls:
-        try:
-            books.append(get_book_data(u))
-        except Exception:
-            # не валимся на одной неудачной книге
-            continue
+    if is_save and not return_json:
+        # NDJSON пишем по мере разбора книг (одна книга = одна строка JSON),
+        # не собирая перед записью всю выгрузку одним большим буфером
+        with open(_ensure_artifacts_file(), "wb", buffering=1 << 20) as out:
+
+            def _save_book(obj: dict) -> None:
+                obj.setdefault("_source_url", "")
+                out.write(_json_bytes(obj) + b"\n")
+                books.append(obj)
+
+            _scrape_book_pages(urls, _save_book)
+    else:
+        _scrape_book_pages(urls, books.append)
 
     if verbose and (time.time() - t1) > 0:
         dt = time.time() - t1
         speed = len(books) / dt if dt > 0 else 0
         print(f"Время парсинга книг: {dt:.2f} сек.")
         print(f"Средняя скорость: {speed:.2f} книг/сек")
+    failed = len(urls) - len(books)
+    if verbose and failed:
+        print(f"Не удалось скачать/разобрать книг: {failed} из {len(urls)}")
+
+    if not return_json:
+        # NDJSON (если нужен) уже записан во время парсинга
+        return books
 
-    # --- Сохранение ---
+    # --- Сохранение и возврат JSON: сериализуем один раз ---
+    payload = _json_bytes(books)
     if is_save:
-        out_path = _ensure_artifacts_file()
-        if return_json:
-            with open(out_path, "w", encoding="utf-8") as f:
-                f.write(json.dumps(books, ensure_ascii=False, indent=2))
-        else:
-            # NDJSON: одна книга = одна строка JSON
-            with open(out_path, "w", encoding="utf-8") as f:
-                for obj in books:
-                    if "_source_url" not in obj:
-                        obj["_source_url"] = ""
-                    f.write(json.dumps(obj, ensure_ascii=False))
-                    f.write("\n")
-
-    # --- Возврат результата ---
-    if return_json:
-        return json.dumps(books, ensure_ascii=False)
-    return books
+        with open(_ensure_artifacts_file(), "wb") as f:
+            f.write(_json_bytes(books, indent=True) if pretty_json else payload)
+    return payload.decode("utf-8")
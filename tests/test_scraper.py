@@ -1,15 +1,20 @@
 # tests/test_scraper.py
+import asyncio
 import json
+import time
 from pathlib import Path
 import pytest
 
+import scraper
+
 
 # Импортируем функции из твоего модуля (замени имя на реальное, если нужно)
 # Например, если всё в notebook, а ты экспортировал в scraper.py:
-from scraper import get_book_data, scrape_books
+from scraper import _rating_from_class, _to_float_money, get_book_data, scrape_books
 # from __main__ import get_book_data, scrape_books  # если тесты гоняются прямо из ноутбука
 
 
+DATA_DIR = Path(__file__).parent / "data"
 BOOK_PAGE = "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html"
 CATALOG_PAGE1 = "http://books.toscrape.com/catalogue/page-1.html"
 
@@ -51,3 +56,250 @@ def test_scrape_books_saves_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch
         obj = json.loads(line)
         assert isinstance(obj, dict)
         assert "_source_url" in obj
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("£51.77", 51.77),
+        ("Â£51.77", 51.77),
+        (" £1,234.50 ", 1234.5),
+        ("", None),
+        ("n/a", None),
+        ("nan", None),
+        ("inf", None),
+        ("Infinity", None),
+    ],
+)
+def test_to_float_money(text, expected):
+    assert _to_float_money(text) == expected
+
+
+@pytest.mark.parametrize(
+    "classes,expected",
+    [("star-rating Three", "3"), ("Five star-rating", "5"), ("star-rating", None), (None, None)],
+)
+def test_rating_from_class(classes, expected):
+    assert _rating_from_class(classes) == expected
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, text: str = ""):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+def _fake_catalog(n_pages: int):
+    """Подмена _SESSION.get: каталог из n_pages страниц по 2 книги, дальше — 404.
+
+    Номера запрошенных страниц копятся в get.calls.
+    """
+
+    def get(url, **kwargs):
+        n = int(url.rsplit("page-", 1)[1].split(".")[0])
+        get.calls.append(n)
+        if n > n_pages:
+            return _FakeResponse(404)
+        cards = "".join(
+            f'<article class="product_pod"><h3><a href="book-{n}-{i}/index.html">B</a></h3>'
+            "</article>"
+            for i in range(2)
+        )
+        return _FakeResponse(200, f"<html><body><nav>menu</nav>{cards}</body></html>")
+
+    get.calls = []
+    return get
+
+
+@pytest.mark.parametrize(
+    "n_pages", [0, 1, 3, scraper.MAX_CATALOG_PAGES, scraper.MAX_CATALOG_PAGES + 30]
+)
+def test_collect_book_urls_stops_at_404_or_limit(n_pages, monkeypatch: pytest.MonkeyPatch):
+    fake_get = _fake_catalog(n_pages)
+    monkeypatch.setattr(scraper._SESSION, "get", fake_get)
+    urls = scraper._collect_book_urls(CATALOG_PAGE1, page_count=0, verbose=False)
+    expected_pages = min(n_pages, scraper.MAX_CATALOG_PAGES)
+    assert len(urls) == 2 * expected_pages
+    # запросы идут окнами: последнее — окно с первой 404 (или упор в лимит)
+    window = scraper.CATALOG_WORKERS
+    assert len(fake_get.calls) == min(scraper.MAX_CATALOG_PAGES, (n_pages // window + 1) * window)
+    if expected_pages:
+        # порядок каталога и абсолютные URL
+        assert urls[:2] == [
+            "http://books.toscrape.com/catalogue/book-1-0/index.html",
+            "http://books.toscrape.com/catalogue/book-1-1/index.html",
+        ]
+        assert urls[-1] == f"http://books.toscrape.com/catalogue/book-{expected_pages}-1/index.html"
+
+
+@pytest.mark.parametrize("n_pages", [0, 3, 8, 20])
+def test_collect_book_urls_no_requests_past_404_window(n_pages, monkeypatch: pytest.MonkeyPatch):
+    fake_get = _fake_catalog(n_pages)
+    monkeypatch.setattr(scraper._SESSION, "get", fake_get)
+    scraper._collect_book_urls(CATALOG_PAGE1, page_count=0, verbose=False)
+    window = scraper.CATALOG_WORKERS
+    first_404 = n_pages + 1
+    # каждая страница запрошена один раз, и ничего дальше окна с первой 404
+    assert sorted(fake_get.calls) == list(range(1, len(fake_get.calls) + 1))
+    assert first_404 in fake_get.calls
+    assert max(fake_get.calls) < first_404 + window
+
+
+@pytest.mark.parametrize(
+    "n_pages,page_count,expected_urls,expected_gets",
+    [(10, 3, 6, 3), (3, 400, 6, scraper.CATALOG_WORKERS)],
+)
+def test_collect_book_urls_respects_page_count(
+    n_pages, page_count, expected_urls, expected_gets, monkeypatch: pytest.MonkeyPatch
+):
+    fake_get = _fake_catalog(n_pages)
+    monkeypatch.setattr(scraper._SESSION, "get", fake_get)
+    urls = scraper._collect_book_urls(CATALOG_PAGE1, page_count=page_count, verbose=False)
+    assert len(urls) == expected_urls
+    # page_count за концом каталога не приводит к сотням лишних GET
+    assert len(fake_get.calls) == expected_gets
+
+
+def test_parse_book_page_all_fields():
+    # сохранённая копия страницы книги; кодировку lxml берёт из <meta> страницы
+    html = (DATA_DIR / "book_page.html").read_bytes()
+    data = scraper._parse_book_page(html, BOOK_PAGE)
+    assert data == {
+        "title": "A Light in the Attic",
+        "price": 51.77,
+        "price_text": "£51.77",
+        "rating": "3",
+        "availability": "In stock (22 available)",
+        "description": (
+            "It's hard to imagine a world without A Light in the Attic. This now-classic "
+            "collection of poetry and drawings from Shel Silverstein celebrates its 20th "
+            "anniversary with this special edition."
+        ),
+        "product_info": {
+            "UPC": "a897fe39b1053632",
+            "Product Type": "Books",
+            "Price (excl. tax)": "£51.77",
+            "Price (incl. tax)": "£51.77",
+            "Tax": "£0.00",
+            "Availability": "In stock (22 available)",
+            "Number of reviews": "0",
+        },
+        "_source_url": BOOK_PAGE,
+    }
+
+
+@pytest.mark.parametrize("indent", [False, True])
+def test_json_bytes_same_without_orjson(indent, monkeypatch: pytest.MonkeyPatch):
+    pytest.importorskip("orjson")
+    obj = [{"title": "Я £", "price": 51.77, "product_info": {"Tax": "£0.00"}}]
+    with_orjson = scraper._json_bytes(obj, indent=indent)
+    monkeypatch.setattr(scraper, "orjson", None)
+    assert scraper._json_bytes(obj, indent=indent) == with_orjson
+
+
+def _fake_scrape(monkeypatch: pytest.MonkeyPatch, books):
+    """Подменить сеть: каталог из готовых URL, книги — из списка books."""
+    urls = [b["_source_url"] for b in books]
+    monkeypatch.setattr(scraper, "_collect_book_urls", lambda *args: list(urls))
+
+    def scrape_pages(book_urls, on_book):
+        for book in books:
+            on_book(dict(book))
+
+    monkeypatch.setattr(scraper, "_scrape_book_pages", scrape_pages)
+
+
+@pytest.mark.parametrize("pretty_json", [False, True])
+def test_scrape_books_return_json_save(
+    pretty_json, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.chdir(tmp_path)
+    books = [
+        {"title": "A Light in the Attic", "price": 51.77, "_source_url": BOOK_PAGE},
+        {"title": "Soumission", "price": 50.1, "_source_url": BOOK_PAGE + "?2"},
+    ]
+    _fake_scrape(monkeypatch, books)
+
+    res = scrape_books(
+        CATALOG_PAGE1, is_save=True, return_json=True, verbose=False, pretty_json=pretty_json
+    )
+    saved = (tmp_path / "artifacts" / "books_data.txt").read_bytes()
+
+    assert json.loads(res) == books
+    if pretty_json:
+        # отдельная сериализация с отступами, данные те же
+        assert saved != res.encode("utf-8")
+        assert saved.startswith(b"[\n  {")
+        assert json.loads(saved) == books
+    else:
+        # по умолчанию в файл пишется ровно возвращаемая строка
+        assert saved == res.encode("utf-8")
+
+
+def _book_html(title: str) -> bytes:
+    return (
+        '<html><head><meta charset="utf-8"></head><body>'
+        f'<div class="product_main"><h1>{title}</h1></div></body></html>'
+    ).encode("utf-8")
+
+
+def test_scrape_async_retries_and_keeps_order(monkeypatch: pytest.MonkeyPatch):
+    web = pytest.importorskip("aiohttp.web")
+    monkeypatch.setattr(scraper, "RETRY_BACKOFF", 0)
+    hits = {}
+
+    async def handler(request):
+        name = request.match_info["name"]
+        hits[name] = hits.get(name, 0) + 1
+        if name == "flaky" and hits[name] < 3:
+            return web.Response(status=503)
+        if name == "dead":
+            return web.Response(status=503)
+        if name == "missing":
+            return web.Response(status=404)
+        return web.Response(body=_book_html(name), content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            names = ["first", "flaky", "missing", "dead", "last"]
+            urls = [f"http://127.0.0.1:{port}/{n}" for n in names]
+            books = []
+            await scraper._scrape_async(urls, books.append)
+            return books
+        finally:
+            await runner.cleanup()
+
+    books = asyncio.run(run())
+    # неудачные книги пропущены, порядок — как у URL
+    assert [b["title"] for b in books] == ["first", "flaky", "last"]
+    # 503 повторяется, 404 — нет; после RETRIES повторов сдаёмся
+    assert hits == {"first": 1, "flaky": 3, "missing": 1, "dead": scraper.RETRIES + 1, "last": 1}
+
+
+def test_scrape_threaded_fallback_keeps_order_and_skips_errors(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(scraper, "aiohttp", None)
+    urls = [f"{CATALOG_PAGE1}#{i}" for i in range(6)]
+
+    def fake_get_book_data(url, session=None):
+        i = int(url.rsplit("#", 1)[1])
+        time.sleep(0.01 * (len(urls) - i))  # ранние URL завершаются последними
+        if i == 2:
+            raise RuntimeError("broken page")
+        return {"title": str(i), "_source_url": url}
+
+    monkeypatch.setattr(scraper, "get_book_data", fake_get_book_data)
+    books = []
+    scraper._scrape_book_pages(urls, books.append)
+    assert [b["title"] for b in books] == ["0", "1", "3", "4", "5"]